@@ -0,0 +1,33 @@
+# Gunicorn settings for running the API outside the Flask dev server
+# Usage (from the project root): gunicorn -c backend/gunicorn.conf.py
+import os
+
+chdir = os.path.dirname(os.path.abspath(__file__))
+wsgi_app = "server:app"
+bind = "127.0.0.1:5000"
+
+# One worker by default: rate limits (memory:// storage), the video info cache,
+# /info request coalescing and the DOWNLOAD_EXECUTOR cap all live in-process, so
+# extra workers would multiply the limits and split the caches. Downloads are
+# I/O bound, so the worker's thread pool carries the concurrency. With
+# RATELIMIT_STORAGE_URI pointing at a shared store (e.g. Redis) the limits hold
+# across processes, and GUNICORN_WORKERS (default: one per CPU) applies.
+if os.environ.get("RATELIMIT_STORAGE_URI"):
+    workers = int(os.environ.get("GUNICORN_WORKERS", os.cpu_count() or 2))
+else:
+    workers = 1
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+threads = 8
+# Only used by async workers, e.g. GUNICORN_WORKER_CLASS=gevent
+worker_connections = 1000
+
+# Downloads and playlist ZIPs can run for many minutes. On shutdown/reload give
+# in-flight streams as long as a request may take, so they aren't cut off
+timeout = 600
+graceful_timeout = timeout
+
+# Serve finished downloads with sendfile(2) via wsgi.file_wrapper
+sendfile = True
+
+# No max_requests worker recycling: a recycled worker waits only graceful_timeout
+# for open connections and kills the daemon download threads with it
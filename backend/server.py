@@ -1,29 +1,83 @@
 from flask import Flask, jsonify, request, Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+from werkzeug.exceptions import HTTPException, RequestedRangeNotSatisfiable
+from werkzeug.wsgi import wrap_file
 from yt_dlp import YoutubeDL
+from yt_dlp.cookies import extract_cookies_from_browser
 import os
+import re
 import tempfile
 import subprocess
+import sys
 import logging
 import shutil
 import urllib.parse
 import zipfile
+import io
+import json
+import mimetypes
+import queue
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from flask_compress import Compress
+except ImportError:
+    Compress = None
+
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
 
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson (C implementation) for jsonify/get_json"""
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+# Use orjson when installed, otherwise keep Flask's default json
+if orjson is not None:
+    app.json = OrjsonProvider(app)
+
+# Compress JSON responses (format/quality lists repeat the same keys) when
+# flask-compress is installed. Only JSON - video and ZIP bodies are already
+# compressed and are streamed, so they are left alone.
+if Compress is not None:
+    app.config.update(
+        COMPRESS_MIMETYPES=["application/json"],
+        COMPRESS_ALGORITHM=["br", "gzip"],
+        COMPRESS_LEVEL=1,  # gzip - level 1 is nearly as small as 9 on JSON
+        COMPRESS_BR_LEVEL=1,
+    )
+    Compress(app)
+
 # Setup rate limiting
+# memory:// is per process - when running several workers (gunicorn etc.) point
+# RATELIMIT_STORAGE_URI at a shared store such as redis://localhost:6379/0 so the
+# limits apply across all of them instead of multiplying by the worker count
+RATELIMIT_STORAGE_URI = os.environ.get("RATELIMIT_STORAGE_URI", "memory://")
 limiter = Limiter(
     app=app,
     key_func=get_remote_address,
     default_limits=["200 per day", "50 per hour"],
-    storage_uri="memory://"
+    storage_uri=RATELIMIT_STORAGE_URI,
+    # Fixed window is a single INCR+EXPIRE per hit on Redis (moving window needs a sorted set)
+    strategy="fixed-window",
+    # Keep serving with per-process limits if the shared store goes away
+    in_memory_fallback_enabled=RATELIMIT_STORAGE_URI != "memory://",
 )
 
 # Error handler for rate limit exceeded
@@ -38,157 +92,542 @@ def ratelimit_handler(e):
     }), 429
 
 # Server-side cache for video info (reduces repeated yt-dlp calls)
+from collections import OrderedDict, deque
 from functools import lru_cache
-from threading import Lock
+from operator import itemgetter
+from threading import Condition, Event, Lock, Thread, Timer
 import time
 
-# Simple in-memory cache with TTL
+try:
+    from diskcache import Cache as DiskCache
+except ImportError:
+    DiskCache = None
+
+# Persistent cache location (video info, yt-dlp player cache, ...)
+CACHE_DIR = os.environ.get("YTDL_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "ytdl-ext"))
+
+class RWLock:
+    """Readers-writer lock: concurrent readers, exclusive writers (writer-preferring)"""
+    def __init__(self):
+        self._cond = Condition(Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+    
+    def acquire_read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+    
+    def release_read(self):
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+    
+    def acquire_write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+    
+    def release_write(self):
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+class _CacheStripe:
+    """One independently locked shard of the video info cache"""
+    __slots__ = ("lock", "entries")
+    
+    def __init__(self):
+        self.lock = RWLock()
+        self.entries = OrderedDict()  # Ordered oldest -> most recently used
+
+# Simple in-memory LRU cache with TTL, sharded so writers for different videos don't contend
 class VideoInfoCache:
-    def __init__(self, ttl=180):  # Reduced to 3 minutes for faster updates during development
-        self.cache = {}
+    def __init__(self, ttl=180, max_size=50, stripes=16):  # Reduced to 3 minutes for faster updates during development
         self.ttl = ttl
-        self.lock = Lock()
+        self.stripes = [_CacheStripe() for _ in range(stripes)]
+        # Size limit is enforced per stripe
+        self.stripe_size = max(1, -(-max_size // stripes))
+    
+    def _stripe(self, video_id):
+        return self.stripes[hash(video_id) % len(self.stripes)]
     
     def get(self, video_id):
-        with self.lock:
-            if video_id in self.cache:
-                entry = self.cache[video_id]
-                if time.time() - entry['timestamp'] < self.ttl:
-                    logger.info(f"Cache hit for video: {video_id}")
-                    return entry['data']
-                else:
-                    del self.cache[video_id]
+        stripe = self._stripe(video_id)
+        # Cache hits only need the shared read lock so /info lookups run in parallel
+        stripe.lock.acquire_read()
+        try:
+            entry = stripe.entries.get(video_id)
+            if entry is None:
+                return None
+            data, expires_at = entry
+            if time.monotonic() < expires_at:
+                # move_to_end is a single C-level call, atomic under the GIL
+                stripe.entries.move_to_end(video_id)
+                logger.info(f"Cache hit for video: {video_id}")
+                return data
+        finally:
+            stripe.lock.release_read()
+        
+        # Expired - take the write lock to drop it (re-check, a writer may have refreshed it)
+        stripe.lock.acquire_write()
+        try:
+            entry = stripe.entries.get(video_id)
+            if entry is not None and time.monotonic() >= entry[1]:
+                del stripe.entries[video_id]
+        finally:
+            stripe.lock.release_write()
         return None
     
     def set(self, video_id, data):
-        with self.lock:
-            self.cache[video_id] = {
-                'data': data,
-                'timestamp': time.time()
-            }
-            # Limit cache size to 50 entries for faster access
-            if len(self.cache) > 50:
-                oldest_key = min(self.cache.keys(), key=lambda k: self.cache[k]['timestamp'])
-                del self.cache[oldest_key]
+        stripe = self._stripe(video_id)
+        stripe.lock.acquire_write()
+        try:
+            # (data, expiry deadline) - a hit is one clock read and compare, and
+            # the monotonic clock can't be thrown off by wall-clock changes
+            stripe.entries[video_id] = (data, time.monotonic() + self.ttl)
+            stripe.entries.move_to_end(video_id)
+            # Evict least recently used entry - O(1) instead of scanning timestamps
+            if len(stripe.entries) > self.stripe_size:
+                stripe.entries.popitem(last=False)
+        finally:
+            stripe.lock.release_write()
+    
+    def delete(self, video_id):
+        stripe = self._stripe(video_id)
+        stripe.lock.acquire_write()
+        try:
+            return stripe.entries.pop(video_id, None) is not None
+        finally:
+            stripe.lock.release_write()
+    
+    def clear(self):
+        for stripe in self.stripes:
+            stripe.lock.acquire_write()
+            try:
+                stripe.entries.clear()
+            finally:
+                stripe.lock.release_write()
+
+# On-disk cache (SQLite via diskcache) - survives server restarts
+class PersistentVideoInfoCache:
+    def __init__(self, directory, ttl=86400, size_limit=512 * 1024 * 1024):
+        self.cache = DiskCache(directory, size_limit=size_limit)
+        self.ttl = ttl
+    
+    def get(self, video_id):
+        data = self.cache.get(video_id)
+        if data is not None:
+            logger.info(f"Cache hit for video: {video_id}")
+        return data
+    
+    def set(self, video_id, data):
+        self.cache.set(video_id, data, expire=self.ttl)
+    
+    def delete(self, video_id):
+        return self.cache.delete(video_id)
+    
+    def clear(self):
+        self.cache.clear()
+
+def create_video_cache():
+    """Use the persistent cache when diskcache is installed, else fall back to memory"""
+    if DiskCache is not None:
+        try:
+            cache = PersistentVideoInfoCache(os.path.join(CACHE_DIR, "video_info"))
+            logger.info(f"Using persistent video info cache in {CACHE_DIR}")
+            return cache
+        except Exception as e:
+            logger.warning(f"Persistent cache unavailable ({e}), using in-memory cache")
+    return VideoInfoCache()
+
+video_cache = create_video_cache()
+
+# In-flight /info extractions keyed by video ID, so a burst of requests for the
+# same uncached video runs yt-dlp once and the rest read the cached result
+_INFO_INFLIGHT = {}
+_INFO_INFLIGHT_LOCK = Lock()
+INFO_FLIGHT_TIMEOUT = 60  # seconds a follower waits before extracting itself
+
+
+@contextmanager
+def single_flight(key):
+    """Yield True for the one caller that should do the work for key.
+    
+    Concurrent callers block until that caller finishes, then get False
+    (and should re-check the cache). A None key (nothing cacheable to wait
+    for) always yields True without coordinating.
+    """
+    if key is None:
+        yield True
+        return
+    
+    with _INFO_INFLIGHT_LOCK:
+        event = _INFO_INFLIGHT.get(key)
+        leader = event is None
+        if leader:
+            event = _INFO_INFLIGHT[key] = Event()
+    
+    if not leader:
+        event.wait(INFO_FLIGHT_TIMEOUT)
+        yield False
+        return
+    
+    try:
+        yield True
+    finally:
+        with _INFO_INFLIGHT_LOCK:
+            _INFO_INFLIGHT.pop(key, None)
+        event.set()
 
-video_cache = VideoInfoCache()
+# Tool detection results are cached on disk, keyed by executable path + mtime,
+# so restarts skip the fork/exec of "deno --version" / "ffmpeg -version"
+CAPS_FILE = os.path.join(CACHE_DIR, "caps.json")
+
+def _load_caps():
+    try:
+        with open(CAPS_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_caps(caps):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(CAPS_FILE, "w", encoding="utf-8") as f:
+            json.dump(caps, f)
+    except OSError as e:
+        logger.warning(f"Could not save capability cache: {e}")
+
+_CAPS = _load_caps()
+
+def probe_tool(name, version_arg):
+    """Return True if `name` is on PATH and runs, re-probing only when the binary changes"""
+    path = shutil.which(name)
+    if not path:
+        return False
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return False
+    
+    cached = _CAPS.get(name)
+    if cached and cached.get("path") == path and cached.get("mtime") == mtime:
+        return cached["ok"]
+    
+    try:
+        subprocess.run([path, version_arg], capture_output=True, check=True)
+        ok = True
+    except (subprocess.CalledProcessError, OSError):
+        ok = False
+    _CAPS[name] = {"path": path, "mtime": mtime, "ok": ok}
+    _save_caps(_CAPS)
+    return ok
 
 # Find Deno path and add to environment if needed
 def setup_deno_path():
     """Ensure Deno is in PATH for yt-dlp to find"""
-    try:
-        subprocess.run(["deno", "--version"], capture_output=True, check=True)
+    if probe_tool("deno", "--version"):
         print("✓ Deno found in PATH")
         return True
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        deno_paths = [
-            os.path.expanduser("~\\.deno\\bin"),
-            os.path.expandvars("%USERPROFILE%\\.deno\\bin"),
-            "C:\\Program Files\\deno\\bin",
-            os.path.expanduser("~/.deno/bin"),
-        ]
-        for deno_path in deno_paths:
-            deno_exe = os.path.join(deno_path, "deno.exe" if os.name == 'nt' else "deno")
-            if os.path.exists(deno_exe):
-                os.environ["PATH"] = deno_path + os.pathsep + os.environ.get("PATH", "")
-                print(f"✓ Added Deno to PATH: {deno_path}")
-                return True
-        print("⚠ Deno not found - some formats may be unavailable")
-        return False
+    deno_paths = [
+        os.path.expanduser("~\\.deno\\bin"),
+        os.path.expandvars("%USERPROFILE%\\.deno\\bin"),
+        "C:\\Program Files\\deno\\bin",
+        os.path.expanduser("~/.deno/bin"),
+    ]
+    for deno_path in deno_paths:
+        deno_exe = os.path.join(deno_path, "deno.exe" if os.name == 'nt' else "deno")
+        if os.path.exists(deno_exe):
+            os.environ["PATH"] = deno_path + os.pathsep + os.environ.get("PATH", "")
+            print(f"✓ Added Deno to PATH: {deno_path}")
+            return True
+    print("⚠ Deno not found - some formats may be unavailable")
+    return False
 
 DENO_AVAILABLE = setup_deno_path()
 
 # Check for FFmpeg
 def check_ffmpeg():
-    try:
-        subprocess.run(["ffmpeg", "-version"], capture_output=True, check=True)
+    if probe_tool("ffmpeg", "-version"):
         print("✓ FFmpeg found")
         return True
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        print("⚠ FFmpeg not found - some features may be unavailable")
-        return False
+    print("⚠ FFmpeg not found - some features may be unavailable")
+    return False
 
 FFMPEG_AVAILABLE = check_ffmpeg()
 
+class ReadOnlyCookiesYDL(YoutubeDL):
+    """YoutubeDL that never writes its cookie jar back to `cookiefile`.
+    
+    COOKIE_FILE is shared by every request (stream subprocesses get a copy) and is
+    only ever replaced atomically by refresh_browser_cookies(). The stock close()
+    would rewrite it in place with whatever jar the instance loaded - for pooled
+    instances, the jar from before the last refresh.
+    """
+    def save_cookies(self):
+        pass
+
+
+# Pool of idle YoutubeDL instances per options variant. Building a YoutubeDL loads
+# extractors and cookies, so info requests reuse instances instead. An instance is
+# only ever used by one request at a time (YoutubeDL is not thread-safe).
+_YDL_POOL = {}
+_YDL_POOL_LOCK = Lock()
+
+# Background work that shouldn't delay a response - currently /info writing the
+# saved info JSON for /download (save_info_json). Extraction itself runs on the
+# request thread, coalesced per video by single_flight
+EXECUTOR = ThreadPoolExecutor(max_workers=8)
+# Separate pool for playlist video downloads - caps concurrent video downloads
+# server-wide, independent of the request threads
+PLAYLIST_DOWNLOAD_WORKERS = 4
+DOWNLOAD_EXECUTOR = ThreadPoolExecutor(max_workers=PLAYLIST_DOWNLOAD_WORKERS)
+# Parallel fragment fetches per playlist video (x4 videos = up to 16 connections,
+# kept modest to avoid HTTP 429 from YouTube)
+PLAYLIST_FRAGMENT_CONCURRENCY = 4
+# Same for single /download requests - each fragment worker keeps its connection
+# open across fragments (yt-dlp's requests handler pools per YoutubeDL instance)
+DOWNLOAD_FRAGMENT_CONCURRENCY = 4
+
+def _ydl_pool_key(opts):
+    return json.dumps(opts, sort_keys=True, default=repr)
+
+@contextmanager
+def pooled_ydl(opts):
+    """Borrow a YoutubeDL for `opts` from the pool, creating one if none is idle"""
+    key = _ydl_pool_key(opts)
+    with _YDL_POOL_LOCK:
+        idle = _YDL_POOL.get(key)
+        ydl = idle.pop() if idle else None
+    if ydl is None:
+        ydl = ReadOnlyCookiesYDL(opts)
+    try:
+        yield ydl
+    except Exception:
+        # Don't return an instance in an unknown state to the pool
+        ydl.close()
+        raise
+    else:
+        with _YDL_POOL_LOCK:
+            _YDL_POOL.setdefault(key, []).append(ydl)
+
+def extract_info_pooled(opts, url):
+    """extract_info(download=False) on a pooled instance"""
+    with pooled_ydl(opts) as ydl:
+        return ydl.extract_info(url, download=False)
+
+def clear_ydl_pool():
+    """Drop pooled instances (e.g. after cookies change)"""
+    with _YDL_POOL_LOCK:
+        pools = list(_YDL_POOL.values())
+        _YDL_POOL.clear()
+    for idle in pools:
+        for ydl in idle:
+            ydl.close()
+
+# Browser cookies are exported once to a Netscape cookie file and reused, instead of
+# having yt-dlp re-open Firefox's cookie database on every request
+COOKIE_FILE = os.path.join(CACHE_DIR, "cookies.txt")
+COOKIE_REFRESH_INTERVAL = 30 * 60  # seconds
+COOKIES_EXPORTED = False
+
+def refresh_browser_cookies(prewarm=True):
+    """Export Firefox cookies to COOKIE_FILE and schedule the next refresh"""
+    global COOKIES_EXPORTED
+    try:
+        jar = extract_cookies_from_browser("firefox")
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Unique per caller (gunicorn workers all run this at import) and
+        # created 0600 before any cookie is written
+        fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".cookies.tmp")
+        os.close(fd)
+        try:
+            jar.save(tmp_path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        # Pooled instances have already loaded the old cookie jar - drop them
+        # before the new file lands
+        clear_ydl_pool()
+        os.replace(tmp_path, COOKIE_FILE)
+        COOKIES_EXPORTED = True
+        if prewarm:
+            prewarm_ydl_pool()
+        logger.info(f"Exported {len(jar)} browser cookies to {COOKIE_FILE}")
+    except Exception as e:
+        # Keep using the previous export (or live browser cookies if there is none)
+        logger.warning(f"Could not export browser cookies: {e}")
+    
+    timer = Timer(COOKIE_REFRESH_INTERVAL, refresh_browser_cookies)
+    timer.daemon = True
+    timer.start()
+
+# No prewarm on the first run - the pool is warmed once the options below exist
+refresh_browser_cookies(prewarm=False)
+
+def cookie_opts():
+    """yt-dlp cookie options - exported cookie file if available"""
+    if COOKIES_EXPORTED:
+        return {"cookiefile": COOKIE_FILE}
+    return {"cookiesfrombrowser": ("firefox",)}
+
+
+@lru_cache(maxsize=4096)
+def parse_youtube_url(url):
+    """Parse a YouTube URL once, returning (clean_url, video_id).
+    
+    The clean URL drops playlist and other extra parameters. video_id is None
+    for non-video URLs, which are returned unchanged.
+    """
+    if not url or ("youtube.com" not in url and "youtu.be" not in url):
+        return url, None
+    parsed = urllib.parse.urlparse(url)
+    if parsed.netloc.endswith("youtu.be"):
+        video_id = parsed.path.lstrip("/").split("/")[0] or None
+    else:
+        video_id = urllib.parse.parse_qs(parsed.query).get('v', [None])[0]
+    if video_id:
+        return f"https://www.youtube.com/watch?v={video_id}", video_id
+    return url, None
+
 
 def clean_url(url):
     """Clean YouTube URL to remove playlist parameters"""
-    if not url:
-        return url
-    if "youtube.com" in url or "youtu.be" in url:
-        parsed = urllib.parse.urlparse(url)
-        params = urllib.parse.parse_qs(parsed.query)
-        if 'v' in params:
-            return f"https://www.youtube.com/watch?v={params['v'][0]}"
-    return url
+    return parse_youtube_url(url)[0]
 
 
-def get_ydl_opts(for_download=False, format_str="best"):
+# yt-dlp options are built once at import; get_ydl_opts() only layers the
+# per-request fields (cookies, format, postprocessors) on top of a shallow copy
+def _youtube_extractor_args(skip_dash_manifest):
+    # CRITICAL: Enable remote JS challenge solver for YouTube
+    return {
+        "youtube": {
+            "remote_components": ["ejs:github"],
+            # Performance optimizations for faster metadata extraction
+            "player_skip_js_fetch": True,
+            "skip_dash_manifest": skip_dash_manifest,  # Skip DASH for info requests
+        }
+    }
+
+# Size of each ranged request yt-dlp makes for a direct (non-fragmented) download.
+# Larger chunks waste less time in per-request RTT/TCP ramp-up on fast links;
+# smaller ones lose less on a dropped connection. Tunable per request with ?chunk_mb=
+HTTP_CHUNK_SIZE = int(os.environ.get("YTDL_CHUNK_MB", "16")) * 1024 * 1024
+MAX_CHUNK_MB = 64
+
+
+def request_chunk_size():
+    """http_chunk_size for this request: ?chunk_mb= (1-MAX_CHUNK_MB) or the default"""
+    chunk_mb = request.args.get("chunk_mb", type=int)
+    if not chunk_mb:
+        return HTTP_CHUNK_SIZE
+    return min(max(chunk_mb, 1), MAX_CHUNK_MB) * 1024 * 1024
+
+
+_BASE_YDL_OPTS = {
+    "quiet": True,
+    "no_warnings": True,
+    "ignoreerrors": False,
+    "no_color": True,
+    # Network settings optimized for speed
+    "socket_timeout": 30,  # Reduced from 60 seconds
+    "retries": 2,  # Reduced retries for faster failure
+    "fragment_retries": 2,
+    "file_access_retries": 2,
+    # HTTP settings
+    "http_chunk_size": HTTP_CHUNK_SIZE,
+    # Persistent yt-dlp cache (player JS, signature functions) shared across requests
+    "cachedir": os.path.join(CACHE_DIR, "yt-dlp"),
+}
+
+_INFO_YDL_OPTS = {
+    **_BASE_YDL_OPTS,
+    "extractor_args": _youtube_extractor_args(skip_dash_manifest=True),
+    # Skip thumbnail extraction for faster loading
+    "writethumbnail": False,
+    "writeinfojson": False,
+    # Reduce format processing overhead
+    "listformats": False,
+    # Skip subtitle info for faster metadata
+    "listsubtitles": False,
+    "writeautomaticsub": False,
+    "writesubtitles": False,
+    "skip_download": True,
+}
+
+# Prefer mp4 when possible, but don't require it
+FORMAT_SORT = ("ext:mp4:m4a", "res")
+
+_DOWNLOAD_YDL_OPTS = {
+    **_BASE_YDL_OPTS,
+    "extractor_args": _youtube_extractor_args(skip_dash_manifest=False),
+    "concurrent_fragment_downloads": DOWNLOAD_FRAGMENT_CONCURRENCY,
+}
+if FFMPEG_AVAILABLE:
+    _DOWNLOAD_YDL_OPTS["merge_output_format"] = "mp4"
+
+AUDIO_ONLY_FORMATS = ("bestaudio", "bestaudio/best")
+
+
+def get_ydl_opts(for_download=False, format_str="best", chunk_size=None):
     """Get yt-dlp options that work with current YouTube restrictions"""
+    if not for_download:
+        # Use browser cookies for authentication
+        return {**_INFO_YDL_OPTS, **cookie_opts()}
+    
+    # Simplify format - let yt-dlp choose the best available
+    # The format_str from client is already simple like "best" or "best[height<=720]/best"
     opts = {
-        "quiet": True,
-        "no_warnings": True,
-        "ignoreerrors": False,
-        "no_color": True,
-        # Try to use browser cookies for authentication
-        "cookiesfrombrowser": ("firefox",),
-        # CRITICAL: Enable remote JS challenge solver for YouTube
-        "extractor_args": {
-            "youtube": {
-                "remote_components": ["ejs:github"],
-                # Performance optimizations for faster metadata extraction
-                "player_skip_js_fetch": True,
-                "skip_dash_manifest": not for_download,  # Skip DASH for info requests
-            }
-        },
-        # Network settings optimized for speed
-        "socket_timeout": 30,  # Reduced from 60 seconds
-        "retries": 2,  # Reduced retries for faster failure
-        "fragment_retries": 2,
-        "file_access_retries": 2,
-        # HTTP settings
-        "http_chunk_size": 10485760,  # 10MB chunks
+        **_DOWNLOAD_YDL_OPTS,
+        **cookie_opts(),
+        "format": format_str,
+        "format_sort": list(FORMAT_SORT),
+        # Fresh list - callers append subtitle postprocessors to it
+        "postprocessors": [],
     }
+    if chunk_size:
+        opts["http_chunk_size"] = chunk_size
     
-    # Additional optimizations for info requests
-    if not for_download:
-        opts.update({
-            # Skip thumbnail extraction for faster loading
-            "writethumbnail": False,
-            "writeinfojson": False,
-            # Reduce format processing overhead
-            "listformats": False,
-            # Skip subtitle info for faster metadata
-            "listsubtitles": False,
-            "writeautomaticsub": False,
-            "writesubtitles": False,
-        })
-    
-    if for_download:
-        # Simplify format - let yt-dlp choose the best available
-        # The format_str from client is already simple like "best" or "best[height<=720]/best"
-        opts.update({
-            "format": format_str,
-            # Prefer mp4 when possible, but don't require it
-            "format_sort": ["ext:mp4:m4a", "res"],
+    if FFMPEG_AVAILABLE and format_str in AUDIO_ONLY_FORMATS:
+        opts["postprocessors"].append({
+            "key": "FFmpegExtractAudio",
+            "preferredcodec": "mp3",
+            "preferredquality": "192",
         })
-        
-        # Initialize postprocessors list
-        opts["postprocessors"] = []
-        
-        if FFMPEG_AVAILABLE:
-            opts["merge_output_format"] = "mp4"
-            if format_str == "bestaudio" or format_str == "bestaudio/best":
-                opts["postprocessors"].append({
-                    "key": "FFmpegExtractAudio",
-                    "preferredcodec": "mp3",
-                    "preferredquality": "192",
-                })
-    else:
-        opts["skip_download"] = True
     
     return opts
 
+# Idle /info instances built ahead of time, so the first requests after startup
+# (or after a cookie refresh empties the pool) don't pay for YoutubeDL setup
+YDL_POOL_PREWARM = 2
+
+
+def prewarm_ydl_pool(count=YDL_POOL_PREWARM):
+    """Add `count` ready YoutubeDL instances for the info options to the pool"""
+    opts = get_ydl_opts(for_download=False)
+    key = _ydl_pool_key(opts)
+    try:
+        ydls = []
+        for _ in range(count):
+            ydl = ReadOnlyCookiesYDL(opts)
+            ydl.get_info_extractor("Youtube")  # Instantiate the extractor up front
+            ydls.append(ydl)
+    except Exception as e:
+        logger.warning(f"Could not prewarm YoutubeDL pool: {e}")
+        return
+    with _YDL_POOL_LOCK:
+        _YDL_POOL.setdefault(key, []).extend(ydls)
+
+
+Thread(target=prewarm_ydl_pool, daemon=True).start()
+
 @app.route("/health", methods=["GET"])
 @limiter.limit("30 per minute")
 def health_check():
@@ -205,9 +644,118 @@ def ping():
     return jsonify({"status": "ok"}), 200
 
 
+# Read size used when streaming finished files back to the client
+STREAM_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+
+# Download temp dirs go to $YTDLP_TMPDIR if set, else the OS default. With
+# YTDL_USE_SHM=1 they go to /dev/shm (RAM-backed tmpfs) while it has room: that
+# takes disk bandwidth out of the download -> send path, but every in-flight
+# download (a 4K video, 4 parallel playlist entries) then sits in RAM - so it's
+# opt-in for hosts with memory to spare.
+SHM_DIR = "/dev/shm"
+SHM_MIN_FREE = 2 << 30  # 2GB
+USE_SHM = os.environ.get("YTDL_USE_SHM", "").lower() in ("1", "true", "yes")
+
+
+def download_temp_root():
+    """Directory to create per-request download temp dirs in (None = OS default)"""
+    tmp_root = os.environ.get("YTDLP_TMPDIR")
+    if tmp_root:
+        return tmp_root
+    if USE_SHM and os.path.isdir(SHM_DIR):
+        try:
+            if shutil.disk_usage(SHM_DIR).free > SHM_MIN_FREE:
+                return SHM_DIR
+        except OSError:
+            pass
+    return None
+
+
+def remove_temp_dir(path, message="Temp files cleaned up", background=True):
+    """Delete a per-request temp dir - the single cleanup point for each request.
+    
+    By default the rmtree runs on a daemon thread, so the worker is free for the
+    next request instead of unlinking files after the response has been sent.
+    """
+    def rmtree():
+        try:
+            shutil.rmtree(path, ignore_errors=True)
+            logger.info(message)
+        except Exception as e:
+            logger.error(f"Cleanup error: {e}")
+    
+    if background:
+        Thread(target=rmtree, daemon=True).start()
+    else:
+        rmtree()
+
+
+# Behind nginx, set YTDL_ACCEL_REDIRECT to an `internal` location aliased to
+# YTDLP_TMPDIR (e.g. "/ytdl-files" -> alias /var/tmp/ytdl/;) and nginx serves the
+# finished file itself. The temp dir is removed after a delay, since nginx opens
+# the file only once it has the response headers.
+ACCEL_REDIRECT_PREFIX = os.environ.get("YTDL_ACCEL_REDIRECT", "").rstrip("/")
+ACCEL_REDIRECT_ROOT = os.environ.get("YTDLP_TMPDIR")
+ACCEL_CLEANUP_DELAY = 300  # seconds
+if ACCEL_REDIRECT_PREFIX and not ACCEL_REDIRECT_ROOT:
+    # The nginx alias is one fixed directory; without YTDLP_TMPDIR the temp root
+    # can change per request (/dev/shm vs the OS default) and paths would 404
+    logger.warning("YTDL_ACCEL_REDIRECT needs YTDLP_TMPDIR set - X-Accel-Redirect disabled")
+    ACCEL_REDIRECT_PREFIX = ""
+
+
+class TempDirFile(io.FileIO):
+    """Read-only file that removes its request's temp dir when it is closed.
+    
+    A direct_passthrough response is returned to the WSGI server as-is, so
+    call_on_close never fires - the server only closes the body iterable
+    (wrap_file's wrapper), which closes this file.
+    """
+    def __init__(self, path, temp_dir):
+        super().__init__(path, "rb")
+        self.temp_dir = temp_dir
+    
+    def close(self):
+        if not self.closed:
+            super().close()
+            remove_temp_dir(self.temp_dir)
+
+
+def open_for_streaming(path, temp_dir=None):
+    """Open a file for one sequential pass in STREAM_CHUNK_SIZE reads.
+    
+    Unbuffered, since reads are already large, and on Linux the kernel is told
+    the access is sequential so it reads ahead more aggressively. With temp_dir,
+    closing the file also removes that directory.
+    """
+    f = TempDirFile(path, temp_dir) if temp_dir else open(path, "rb", buffering=0)
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except OSError:
+            pass
+    return f
+
 # Log file path in project folder
 LOG_FILE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "extension_logs.txt")
 
+
+def format_log_lines(logs):
+    """Yield extension log entries as text lines, newline-separated"""
+    for i, entry in enumerate(logs):
+        timestamp = entry.get("timestamp", "")
+        source = entry.get("source", "unknown").upper()
+        log_type = entry.get("type", "INFO")
+        message = entry.get("message", "")
+        data_str = entry.get("data", "")
+        
+        line = f"[{timestamp}] [{source}] [{log_type}] {message}"
+        if data_str:
+            line += f" | {data_str}"
+        yield line if i == 0 else "\n" + line
+
+
 @app.route("/save-logs", methods=["POST"])
 def save_logs():
     """Save extension logs to a file in the project folder"""
@@ -219,28 +767,13 @@ def save_logs():
         if not logs:
             return jsonify({"success": False, "error": "No logs provided"}), 400
         
-        # Format logs as text
-        log_lines = []
-        for entry in logs:
-            timestamp = entry.get("timestamp", "")
-            source = entry.get("source", "unknown").upper()
-            log_type = entry.get("type", "INFO")
-            message = entry.get("message", "")
-            data_str = entry.get("data", "")
-            
-            line = f"[{timestamp}] [{source}] [{log_type}] {message}"
-            if data_str:
-                line += f" | {data_str}"
-            log_lines.append(line)
-        
-        log_text = "\n".join(log_lines)
-        
-        # Write to file
+        # Write to file - lines are formatted and written one at a time
+        # instead of building the whole log text in memory first
         mode = "a" if append else "w"
         with open(LOG_FILE_PATH, mode, encoding="utf-8") as f:
             if append and os.path.exists(LOG_FILE_PATH) and os.path.getsize(LOG_FILE_PATH) > 0:
                 f.write("\n")
-            f.write(log_text)
+            f.writelines(format_log_lines(logs))
         
         logger.info(f"Saved {len(logs)} log entries to {LOG_FILE_PATH}")
         return jsonify({
@@ -328,6 +861,45 @@ def extract_chapters(info_dict):
     return chapters
 
 
+def run_with_stderr_tail(cmd, timeout, max_lines=20):
+    """Run a command keeping only the last `max_lines` of stderr.
+    
+    FFmpeg can write megabytes of progress output on long files; only the tail
+    is useful for error messages, so it is read line by line into a ring buffer
+    instead of being captured whole. Raises subprocess.TimeoutExpired.
+    """
+    proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, text=True, errors="replace")
+    timed_out = []
+    
+    def kill():
+        timed_out.append(True)
+        proc.kill()
+    
+    watchdog = Timer(timeout, kill)
+    watchdog.start()
+    try:
+        tail = deque(proc.stderr, maxlen=max_lines)
+        returncode = proc.wait()
+    finally:
+        watchdog.cancel()
+        proc.stderr.close()
+    
+    if timed_out:
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    return returncode, "".join(tail)
+
+
+# FFMETADATA escaping for chapter titles, applied in a single pass
+_FFMETADATA_ESCAPE = str.maketrans({
+    "=": "\\=",
+    ";": "\\;",
+    "#": "\\#",
+    "\\": "\\\\",
+    "\n": " ",
+})
+
+
 def embed_chapters_in_video(video_path, chapters, temp_dir):
     """Embed chapter metadata into video file using FFmpeg"""
     if not chapters or not FFMPEG_AVAILABLE:
@@ -337,19 +909,17 @@ def embed_chapters_in_video(video_path, chapters, temp_dir):
         # Create FFmpeg metadata file
         metadata_path = os.path.join(temp_dir, "chapters_metadata.txt")
         
+        lines = [";FFMETADATA1\n"]
+        for chapter in chapters:
+            start_ms = int(chapter["start_time"] * 1000)
+            end_ms = int(chapter["end_time"] * 1000)
+            title = chapter["title"].translate(_FFMETADATA_ESCAPE)
+            lines.append(
+                f"\n[CHAPTER]\nTIMEBASE=1/1000\nSTART={start_ms}\nEND={end_ms}\ntitle={title}\n"
+            )
+        
         with open(metadata_path, "w", encoding="utf-8") as f:
-            f.write(";FFMETADATA1\n")
-            
-            for chapter in chapters:
-                start_ms = int(chapter["start_time"] * 1000)
-                end_ms = int(chapter["end_time"] * 1000)
-                title = chapter["title"].replace("=", "\\=").replace(";", "\\;").replace("#", "\\#").replace("\\", "\\\\").replace("\n", " ")
-                
-                f.write("\n[CHAPTER]\n")
-                f.write("TIMEBASE=1/1000\n")
-                f.write(f"START={start_ms}\n")
-                f.write(f"END={end_ms}\n")
-                f.write(f"title={title}\n")
+            f.write("".join(lines))
         
         # Create output filename
         base, ext = os.path.splitext(video_path)
@@ -367,15 +937,15 @@ def embed_chapters_in_video(video_path, chapters, temp_dir):
         ]
         
         logger.info(f"Embedding {len(chapters)} chapters into video...")
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+        returncode, stderr_tail = run_with_stderr_tail(cmd, timeout=300)
         
-        if result.returncode == 0 and os.path.exists(output_path):
+        if returncode == 0 and os.path.exists(output_path):
             # Remove original file and use the chaptered version
             os.remove(video_path)
             logger.info(f"Successfully embedded {len(chapters)} chapters")
             return output_path
         else:
-            logger.warning(f"FFmpeg chapter embedding failed: {result.stderr[:500] if result.stderr else 'Unknown error'}")
+            logger.warning(f"FFmpeg chapter embedding failed: {stderr_tail[-500:] if stderr_tail else 'Unknown error'}")
             return video_path
             
     except subprocess.TimeoutExpired:
@@ -386,6 +956,127 @@ def embed_chapters_in_video(video_path, chapters, temp_dir):
         return video_path
 
 
+# Codec detection: one compiled regex pass instead of cascaded substring checks
+CODEC_RE = re.compile(r"avc|hevc|hev|vp09|vp9|av01|av1")
+CODEC_MAP = {
+    "avc": "h264",
+    "hevc": "h265",
+    "hev": "h265",
+    "vp09": "vp9",
+    "vp9": "vp9",
+    "av01": "av1",
+    "av1": "av1",
+}
+
+
+@lru_cache(maxsize=256)
+def codec_label(vcodec, default="mp4"):
+    """Map a yt-dlp vcodec string (e.g. 'avc1.64001F') to a short display name (memoized per string)"""
+    m = CODEC_RE.search(vcodec.lower()) if vcodec else None
+    return CODEC_MAP[m.group()] if m else default
+
+
+def process_formats(formats):
+    """Build the available qualities list (one entry per height, highest first) in a single pass"""
+    # The dict is the dedupe: first format seen per height wins, later ones
+    # can only raise its filesize estimate
+    by_height = {}
+    
+    for f in formats:
+        height = f.get("height")
+        vcodec = f.get("vcodec") or ""
+        if not height or vcodec == "none":
+            continue
+        filesize = f.get("filesize") or f.get("filesize_approx") or 0
+        
+        quality_info = by_height.get(height)
+        if quality_info is not None:
+            # Update filesize if this format has better estimate
+            if filesize > quality_info["_filesize"]:
+                quality_info["_filesize"] = filesize
+            continue
+        
+        by_height[height] = {
+            "height": height,
+            "label": f"{height}p",
+            "codec": codec_label(vcodec),
+            "vcodec": vcodec,
+            "_filesize": filesize,
+        }
+    
+    # Sort by height (highest first)
+    available_qualities = sorted(by_height.values(), key=itemgetter("height"), reverse=True)
+    for quality_info in available_qualities:
+        filesize = quality_info.pop("_filesize")
+        # Add filesize if available
+        if filesize:
+            quality_info["filesize"] = int(filesize * 1.1)  # Add audio estimate
+    
+    max_height = available_qualities[0]["height"] if available_qualities else 0
+    return available_qualities, max_height
+
+
+# /info keeps the full extraction result on disk for a short while so a follow-up
+# /download of the same video can skip a second YouTube extraction (the
+# --load-info-json flow). Stream URLs expire after a few hours; stay well inside that.
+INFO_JSON_DIR = os.path.join(CACHE_DIR, "info_json")
+INFO_JSON_TTL = 15 * 60  # seconds
+# IDs come straight from the request URL - only plain ones become file names
+_VIDEO_ID_RE = re.compile(r"[\w-]{1,64}")
+
+
+def _info_json_path(video_id):
+    if not video_id or not _VIDEO_ID_RE.fullmatch(video_id):
+        return None
+    return os.path.join(INFO_JSON_DIR, f"{video_id}.json")
+
+
+def save_info_json(video_id, info):
+    """Write a sanitized info dict for video_id, pruning expired files"""
+    path = _info_json_path(video_id)
+    if path is None:
+        return
+    try:
+        os.makedirs(INFO_JSON_DIR, exist_ok=True)
+        cutoff = time.time() - INFO_JSON_TTL
+        with os.scandir(INFO_JSON_DIR) as entries:
+            for entry in entries:
+                try:
+                    if entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                except OSError:
+                    pass
+        
+        # mkstemp files are 0600, like the cookie file - format headers can carry session data
+        fd, tmp_path = tempfile.mkstemp(dir=INFO_JSON_DIR, suffix=".tmp")
+        with open(fd, "w", encoding="utf-8") as f:
+            json.dump(info, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.warning(f"Could not save info JSON for {video_id}: {e}")
+
+
+def load_info_json(video_id):
+    """Return the saved info dict for video_id if still fresh, else None"""
+    path = _info_json_path(video_id)
+    if path is None:
+        return None
+    try:
+        if time.time() - os.path.getmtime(path) >= INFO_JSON_TTL:
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def conditional_json(data):
+    """jsonify with an ETag, answering 304 when the client already has this payload"""
+    response = jsonify(data)
+    response.add_etag()
+    return response.make_conditional(request)
+
+
 @app.route("/info", methods=["GET"])
 @limiter.limit("30 per minute")
 def info():
@@ -395,116 +1086,256 @@ def info():
     if not url:
         return jsonify({"error": "URL parameter is required"}), 400
     
-    url = clean_url(url)
-    
-    # Extract video ID for caching
-    video_id = None
-    if "youtube.com" in url or "youtu.be" in url:
-        parsed = urllib.parse.urlparse(url)
-        params = urllib.parse.parse_qs(parsed.query)
-        video_id = params.get('v', [None])[0]
+    # Clean URL and extract video ID for caching in one parse
+    url, video_id = parse_youtube_url(url)
     
     # Check cache first
     if video_id:
         cached = video_cache.get(video_id)
         if cached:
-            return jsonify(cached)
-    
-    logger.info(f"Fetching info for: {url}")
+            return conditional_json(cached)
     
-    ydl_opts = get_ydl_opts(for_download=False)
-    
-    try:
-        with YoutubeDL(ydl_opts) as ydl:
-            info_dict = ydl.extract_info(url, download=False)
-            
-            # Fast format processing - focus on video qualities only
-            available_qualities = []
-            resolution_filesizes = {}
-            seen_heights = set()
-            
-            # Process formats more efficiently - skip full format details for speed
-            video_formats = [f for f in info_dict.get("formats", []) 
-                           if f.get("height") and f.get("vcodec") != "none"]
-            
-            # Quick processing of video formats only
-            for f in video_formats:
-                height = f.get("height")
-                vcodec = f.get("vcodec", "")
-                filesize = f.get("filesize") or f.get("filesize_approx") or 0
-                
-                # Skip if we already have this resolution
-                if height in seen_heights:
-                    # Update filesize if this format has better estimate
-                    if filesize and (height not in resolution_filesizes or filesize > resolution_filesizes[height]):
-                        resolution_filesizes[height] = filesize
-                    continue
-                    
-                seen_heights.add(height)
+    # Only coalesce when there's a cache entry to wait for - without a video ID
+    # a follower would just extract again after waiting
+    with single_flight(video_id) as leader:
+        # Another request just fetched this video - serve what it cached
+        if not leader:
+            cached = video_cache.get(video_id)
+            if cached:
+                return conditional_json(cached)
+        
+        logger.info(f"Fetching info for: {url}")
+        
+        ydl_opts = get_ydl_opts(for_download=False)
+        
+        try:
+            with pooled_ydl(ydl_opts) as ydl:
+                info_dict = ydl.extract_info(url, download=False)
                 
-                # Quick codec detection
-                codec_display = (
-                    "h264" if "avc" in vcodec.lower() else
-                    "h265" if "hevc" in vcodec.lower() or "hev" in vcodec.lower() else
-                    "vp9" if "vp9" in vcodec.lower() or "vp09" in vcodec.lower() else
-                    "av1" if "av01" in vcodec.lower() or "av1" in vcodec.lower() else
-                    "mp4"  # Default fallback
-                )
+                # Keep the full result for /download (written off the request thread).
+                # Like --write-info-json, drop the keys from this format selection
+                # (requested_formats etc.) so /download selects afresh
+                if video_id:
+                    EXECUTOR.submit(save_info_json, video_id, ydl.sanitize_info(info_dict, remove_private_keys=True))
                 
-                quality_info = {
-                    "height": height,
-                    "label": f"{height}p",
-                    "codec": codec_display,
-                    "vcodec": vcodec,
-                }
+                unique_qualities, max_height = process_formats(info_dict.get("formats", []))
                 
-                # Add filesize if available
-                if filesize:
-                    resolution_filesizes[height] = filesize
-                    quality_info["filesize"] = int(filesize * 1.1)  # Add audio estimate
-                    
-                available_qualities.append(quality_info)
+                # Simplified formats array for compatibility (optional)
+                formats = [{
+                    "format_id": "best",
+                    "ext": "mp4", 
+                    "resolution": f"{max_height}p",
+                    "height": max_height,
+                    "vcodec": "h264",
+                    "acodec": "aac",
+                }] if max_height else []
             
-            # Sort by height (highest first)
-            available_qualities.sort(key=lambda x: x["height"], reverse=True)
+                logger.info(f"Found {len(unique_qualities)} unique resolutions for: {info_dict.get('title')}")
             
-            # Use available_qualities directly (already unique)
-            unique_qualities = available_qualities
-            
-            # Simplified formats array for compatibility (optional)
-            formats = [{
-                "format_id": "best",
-                "ext": "mp4", 
-                "resolution": f"{max(seen_heights) if seen_heights else 720}p",
-                "height": max(seen_heights) if seen_heights else 720,
-                "vcodec": "h264",
-                "acodec": "aac",
-            }] if seen_heights else []
-            
-            logger.info(f"Found {len(unique_qualities)} unique resolutions for: {info_dict.get('title')}")
-            
-            result = {
-                "success": True,
-                "id": info_dict.get("id"),
-                "title": info_dict.get("title"),
-                "thumbnail": info_dict.get("thumbnail"),
-                "duration": info_dict.get("duration"),
-                "channel": info_dict.get("channel"),
-                "view_count": info_dict.get("view_count"),
-                "upload_date": info_dict.get("upload_date"),
-                "formats": formats,
-                "available_qualities": unique_qualities,
-                "chapters": extract_chapters(info_dict)
-            }
+                result = {
+                    "success": True,
+                    "id": info_dict.get("id"),
+                    "title": info_dict.get("title"),
+                    "thumbnail": info_dict.get("thumbnail"),
+                    "duration": info_dict.get("duration"),
+                    "channel": info_dict.get("channel"),
+                    "view_count": info_dict.get("view_count"),
+                    "upload_date": info_dict.get("upload_date"),
+                    "formats": formats,
+                    "available_qualities": unique_qualities,
+                    "chapters": extract_chapters(info_dict)
+                }
             
-            # Cache the result
-            if video_id:
-                video_cache.set(video_id, result)
+                # Cache the result
+                if video_id:
+                    video_cache.set(video_id, result)
             
-            return jsonify(result)
-    except Exception as e:
-        logger.error(f"Error fetching info: {e}")
-        return jsonify({"success": False, "error": str(e)}), 500
+                return conditional_json(result)
+        except Exception as e:
+            logger.error(f"Error fetching info: {e}")
+            return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route("/invalidate", methods=["POST"])
+@limiter.limit("30 per minute")
+def invalidate():
+    """Drop cached video info (one video via ?url= / ?id=, or everything)"""
+    url = request.args.get("url")
+    video_id = request.args.get("id")
+    
+    if url and not video_id:
+        video_id = parse_youtube_url(url)[1]
+        if not video_id:
+            return jsonify({"success": False, "error": "Could not find a video ID in URL"}), 400
+    
+    if video_id:
+        removed = video_cache.delete(video_id)
+        logger.info(f"Invalidated cache for video: {video_id}")
+        return jsonify({"success": True, "removed": bool(removed)}), 200
+    
+    video_cache.clear()
+    logger.info("Cleared video info cache")
+    return jsonify({"success": True}), 200
+
+
+MIME_TYPES = {
+    ".mp4": "video/mp4",
+    ".webm": "video/webm",
+    ".mkv": "video/x-matroska",
+    ".mp3": "audio/mpeg",
+    ".m4a": "audio/mp4",
+    ".opus": "audio/opus",
+}
+
+# Load the system mime type tables once at import
+mimetypes.init()
+
+
+def mime_type_for(ext):
+    """Mime type for a file extension - known media types first, then the system tables"""
+    ext = ext.lower()
+    return MIME_TYPES.get(ext) or mimetypes.types_map.get(ext) or "application/octet-stream"
+
+
+# Filename cleanup: one C-level regex pass instead of per-character Python loops.
+# \w is Unicode-aware, matching the previous isalnum()/"_" check
+_UNSAFE_FILENAME_RE = re.compile(r"[^\w \-]+")
+_NON_ASCII_RE = re.compile(r"[^\x00-\x7f]")
+
+
+def safe_filename_part(text):
+    """Keep only letters, digits, spaces, '-' and '_'"""
+    return _UNSAFE_FILENAME_RE.sub("", text).strip()
+
+
+def build_download_filename(video_title, channel_name, resolution, codec, ext):
+    """Build download filename: "Video Title - Channel (Resolution, Codec).ext" """
+    # Clean characters for filename - be more restrictive for HTTP headers
+    safe_title = safe_filename_part(video_title)
+    safe_channel = safe_filename_part(channel_name)
+    
+    if not safe_title:
+        safe_title = "video"
+    
+    # Build the filename parts
+    if safe_channel and resolution and codec:
+        return f"{safe_title} - {safe_channel} ({resolution}, {codec}){ext}"
+    elif safe_channel and resolution:
+        return f"{safe_title} - {safe_channel} ({resolution}){ext}"
+    elif safe_channel:
+        return f"{safe_title} - {safe_channel}{ext}"
+    return f"{safe_title}{ext}"
+
+
+def content_disposition(filename):
+    """Build an attachment Content-Disposition header value"""
+    # Use both filename (ASCII fallback) and filename* (UTF-8 encoded, RFC 5987) for compatibility
+    ascii_filename = _NON_ASCII_RE.sub("_", filename)
+    return f"attachment; filename=\"{ascii_filename}\"; filename*=UTF-8''{urllib.parse.quote(filename)}"
+
+
+def sniff_media_ext(head):
+    """Guess the container extension from the first bytes of a media stream"""
+    if head[4:8] == b"ftyp":
+        return ".m4a" if head[8:11] == b"M4A" else ".mp4"
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return ".webm" if b"webm" in head[:64] else ".mkv"
+    if head[:3] == b"ID3" or head[:2] in (b"\xff\xfb", b"\xff\xf3", b"\xff\xf2"):
+        return ".mp3"
+    if head[:4] == b"OggS":
+        return ".opus"
+    return ".mp4"
+
+
+def stream_download(url, format_str, video_title, channel_name, resolution, codec, chunk_size=HTTP_CHUNK_SIZE):
+    """Pipe yt-dlp's output straight to the client while it downloads.
+    
+    Runs yt-dlp as a subprocess writing to stdout (-o -) so network-in and
+    network-out overlap. Merged formats are muxed to Matroska, which FFmpeg
+    can write to a pipe. No post-processing (chapters, mp3 extraction) is
+    possible in this mode and Content-Length is unknown (chunked transfer).
+    """
+    # The yt-dlp CLI rewrites its --cookies file on exit, so it gets a private
+    # copy instead of the shared export (which only refresh_browser_cookies writes)
+    cookie_copy = None
+    if COOKIES_EXPORTED:
+        fd, cookie_copy = tempfile.mkstemp(dir=CACHE_DIR, suffix=".cookies.txt")
+        os.close(fd)
+        shutil.copyfile(COOKIE_FILE, cookie_copy)  # Keeps mkstemp's 0600 mode
+    
+    cmd = [
+        sys.executable, "-m", "yt_dlp",
+        "--quiet", "--no-warnings", "--no-part",
+        "--remote-components", "ejs:github",
+        *(["--cookies", cookie_copy] if cookie_copy else ["--cookies-from-browser", "firefox"]),
+        "-f", format_str,
+        "-S", "ext:mp4:m4a,res",
+        "--merge-output-format", "mkv",
+        "--http-chunk-size", str(chunk_size),
+        "-o", "-",
+        url,
+    ]
+    def remove_cookie_copy():
+        if cookie_copy:
+            try:
+                os.remove(cookie_copy)
+            except OSError:
+                pass
+    
+    stderr_file = tempfile.TemporaryFile()
+    try:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file, bufsize=STREAM_CHUNK_SIZE)
+    except Exception:
+        stderr_file.close()
+        remove_cookie_copy()
+        raise
+    
+    def finish():
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+        proc.stdout.close()
+        stderr_file.close()
+        remove_cookie_copy()
+    
+    # Wait for the first bytes before answering so failures still get a JSON error
+    head = proc.stdout.read1(STREAM_CHUNK_SIZE)
+    if not head:
+        proc.wait()
+        stderr_file.seek(0)
+        error = stderr_file.read()[-500:].decode("utf-8", "replace").strip()
+        finish()
+        logger.error(f"Streaming download failed: {error or 'no output'}")
+        return jsonify({"success": False, "error": error or "Download failed - no data received"}), 500
+    
+    ext = sniff_media_ext(head)
+    filename = build_download_filename(video_title, channel_name, resolution, codec, ext)
+    mime_type = mime_type_for(ext)
+    logger.info(f"Streaming download: {filename}")
+    
+    def generate():
+        yield head
+        while True:
+            chunk = proc.stdout.read1(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    
+    headers = {
+        "Content-Disposition": content_disposition(filename),
+        "Content-Type": mime_type,
+        "Cache-Control": "no-cache",
+    }
+    response = Response(generate(), mimetype=mime_type, headers=headers)
+    
+    # call_on_close also runs when the body was never iterated (client gone
+    # before the first chunk), unlike a generator's finally block
+    @response.call_on_close
+    def cleanup():
+        finish()
+        logger.info("Streaming download finished")
+    
+    return response
+
 
 @app.route("/download", methods=["GET"])
 @limiter.limit("10 per hour")
@@ -522,18 +1353,23 @@ def download():
     if not url:
         return jsonify({"error": "URL parameter is required"}), 400
     
-    url = clean_url(url)
+    url, video_id = parse_youtube_url(url)
     logger.info(f"Starting download: {url} (format: {format_str})")
     
+    # Pipelined mode: stream bytes while yt-dlp is still downloading
+    if request.args.get("stream") == "1" and not subtitles:
+        return stream_download(url, format_str, video_title, channel_name, resolution, codec,
+                               chunk_size=request_chunk_size())
+    
     temp_dir = None
     
     try:
         # Create temp directory for download
-        temp_dir = tempfile.mkdtemp()
+        temp_dir = tempfile.mkdtemp(dir=download_temp_root())
         output_template = os.path.join(temp_dir, "%(title)s.%(ext)s")
         
         # Get download options
-        ydl_opts = get_ydl_opts(for_download=True, format_str=format_str)
+        ydl_opts = get_ydl_opts(for_download=True, format_str=format_str, chunk_size=request_chunk_size())
         ydl_opts["outtmpl"] = output_template
         
         # Add subtitle options if requested
@@ -567,8 +1403,18 @@ def download():
         logger.info(f"Downloading to: {temp_dir}")
         
         # Download the video
-        with YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
+        with ReadOnlyCookiesYDL(ydl_opts) as ydl:
+            # Reuse the extraction from a recent /info call when we have one
+            saved_info = load_info_json(video_id)
+            info = None
+            if saved_info is not None:
+                try:
+                    logger.info(f"Reusing saved info for: {video_id}")
+                    info = ydl.process_ie_result(saved_info, download=True)
+                except Exception as e:
+                    logger.warning(f"Saved info failed ({e}), extracting again")
+            if info is None:
+                info = ydl.extract_info(url, download=True)
             
             # Get video info for filename if not provided
             if not video_title:
@@ -586,35 +1432,23 @@ def download():
                         if not resolution:
                             resolution = f"{video_fmt.get('height', '')}p"
                         if not codec:
-                            vcodec = video_fmt.get("vcodec", "")
-                            codec = "h264" if "avc" in vcodec.lower() else \
-                                   "h265" if "hevc" in vcodec.lower() else \
-                                   "vp9" if "vp9" in vcodec.lower() else \
-                                   "av1" if "av01" in vcodec.lower() else \
-                                   vcodec.split(".")[0] if vcodec else ""
+                            vcodec = video_fmt.get("vcodec") or ""
+                            codec = codec_label(vcodec, default=vcodec.split(".")[0])
                 elif info.get("height"):
                     if not resolution:
                         resolution = f"{info.get('height')}p"
                     if not codec:
-                        vcodec = info.get("vcodec", "")
-                        codec = "h264" if "avc" in vcodec.lower() else \
-                               "h265" if "hevc" in vcodec.lower() else \
-                               "vp9" if "vp9" in vcodec.lower() else \
-                               "av1" if "av01" in vcodec.lower() else \
-                               vcodec.split(".")[0] if vcodec else ""
-        
-        # Find the downloaded file
-        downloaded_file = None
-        for f in os.listdir(temp_dir):
-            filepath = os.path.join(temp_dir, f)
-            if os.path.isfile(filepath):
-                downloaded_file = filepath
-                break
+                        vcodec = info.get("vcodec") or ""
+                        codec = codec_label(vcodec, default=vcodec.split(".")[0])
+        
+        # Find the downloaded file - scandir returns the file type with each entry,
+        # so there's no extra stat() per file
+        with os.scandir(temp_dir) as entries:
+            downloaded_file = next((e.path for e in entries if e.is_file(follow_symlinks=False)), None)
         
-        if not downloaded_file or not os.path.exists(downloaded_file):
+        if not downloaded_file:
             logger.error("Download failed - no file found")
-            if temp_dir:
-                shutil.rmtree(temp_dir, ignore_errors=True)
+            remove_temp_dir(temp_dir)
             return jsonify({"error": "Download failed - no file created"}), 500
         
         # Embed chapters if available and FFmpeg is present
@@ -625,78 +1459,59 @@ def download():
         file_size = os.path.getsize(downloaded_file)
         ext = os.path.splitext(downloaded_file)[1] or ".mp4"
         
-        # Build filename: "Video Title - Channel (Resolution, Codec).ext"
-        # Clean characters for filename - be more restrictive for HTTP headers
-        safe_title = "".join(c for c in video_title if c.isalnum() or c in " -_").strip()
-        safe_channel = "".join(c for c in channel_name if c.isalnum() or c in " -_").strip()
-        
-        if not safe_title:
-            safe_title = "video"
-        
-        # Build the filename parts
-        if safe_channel and resolution and codec:
-            filename = f"{safe_title} - {safe_channel} ({resolution}, {codec}){ext}"
-        elif safe_channel and resolution:
-            filename = f"{safe_title} - {safe_channel} ({resolution}){ext}"
-        elif safe_channel:
-            filename = f"{safe_title} - {safe_channel}{ext}"
-        else:
-            filename = f"{safe_title}{ext}"
-        
-        # URL-encode the filename for Content-Disposition header (RFC 5987)
-        from urllib.parse import quote
-        filename_encoded = quote(filename)
+        filename = build_download_filename(video_title, channel_name, resolution, codec, ext)
         
         logger.info(f"Download complete: {filename} ({file_size} bytes)")
         
-        # Determine mime type
-        mime_types = {
-            ".mp4": "video/mp4",
-            ".webm": "video/webm",
-            ".mkv": "video/x-matroska",
-            ".mp3": "audio/mpeg",
-            ".m4a": "audio/mp4",
-            ".opus": "audio/opus",
-        }
-        mime_type = mime_types.get(ext.lower(), "application/octet-stream")
+        mime_type = mime_type_for(ext)
         
-        def generate():
-            try:
-                with open(downloaded_file, "rb") as f:
-                    while True:
-                        chunk = f.read(65536)  # 64KB chunks
-                        if not chunk:
-                            break
-                        yield chunk
-            finally:
-                # Cleanup temp directory
-                try:
-                    shutil.rmtree(temp_dir, ignore_errors=True)
-                    logger.info("Temp files cleaned up")
-                except Exception as e:
-                    logger.error(f"Cleanup error: {e}")
-        
-        # Build response headers with proper filename encoding
-        # Use both filename (ASCII fallback) and filename* (UTF-8 encoded) for compatibility
-        ascii_filename = "".join(c if ord(c) < 128 else '_' for c in filename)
         headers = {
-            "Content-Disposition": f"attachment; filename=\"{ascii_filename}\"; filename*=UTF-8''{filename_encoded}",
+            "Content-Disposition": content_disposition(filename),
             "Content-Length": str(file_size),
             "Content-Type": mime_type,
-            "Accept-Ranges": "bytes",
             "Cache-Control": "no-cache",
         }
         
-        return Response(
-            stream_with_context(generate()),
+        if ACCEL_REDIRECT_PREFIX:
+            rel_path = os.path.relpath(downloaded_file, ACCEL_REDIRECT_ROOT)
+            headers["X-Accel-Redirect"] = f"{ACCEL_REDIRECT_PREFIX}/{urllib.parse.quote(rel_path)}"
+            del headers["Content-Length"]  # nginx sets it (and handles Range)
+            response = Response(status=200, mimetype=mime_type, headers=headers)
+            
+            cleanup_timer = Timer(ACCEL_CLEANUP_DELAY, remove_temp_dir, (temp_dir,))
+            cleanup_timer.daemon = True
+            response.call_on_close(cleanup_timer.start)
+            temp_dir = None
+            return response
+        
+        # Hand the open file to the WSGI server's file_wrapper so it can use
+        # sendfile(2) instead of copying every chunk through Python.
+        # From here on the file owns the temp dir: the WSGI server closes the
+        # body once it's sent (or the client goes away), which removes the dir
+        file_handle = open_for_streaming(downloaded_file, temp_dir)
+        temp_dir = None
+        response = Response(
+            wrap_file(request.environ, file_handle, buffer_size=STREAM_CHUNK_SIZE),
             mimetype=mime_type,
-            headers=headers
+            headers=headers,
+            direct_passthrough=True
         )
         
+        # Honour Range / If-Range requests (206 partial content), like send_file does
+        try:
+            response.make_conditional(request.environ, accept_ranges=True, complete_length=file_size)
+        except RequestedRangeNotSatisfiable:
+            response.close()
+            raise
+        
+        return response
+        
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Download error: {e}")
         if temp_dir:
-            shutil.rmtree(temp_dir, ignore_errors=True)
+            remove_temp_dir(temp_dir)
         return jsonify({"success": False, "error": str(e)}), 500
 
 
@@ -712,43 +1527,218 @@ def playlist_info():
     logger.info(f"Fetching playlist info for: {url}")
     
     ydl_opts = get_ydl_opts(for_download=False)
-    ydl_opts["extract_flat"] = True  # Don't extract individual videos, just the playlist info
-    ydl_opts["playlistend"] = 1  # Only check first video to get playlist metadata faster
+    # Flat listing: playlist metadata plus entry stubs in one request, no per-video extraction
+    ydl_opts["extract_flat"] = "in_playlist"
     
     try:
-        with YoutubeDL(ydl_opts) as ydl:
-            info_dict = ydl.extract_info(url, download=False)
-            
-            # Check if this is actually a playlist
-            if info_dict.get("_type") != "playlist" and not info_dict.get("entries"):
-                return jsonify({"success": False, "error": "Not a playlist URL"}), 400
-            
-            # Get full playlist info (need to re-extract without flat for count)
-            ydl_opts_full = get_ydl_opts(for_download=False)
-            ydl_opts_full["extract_flat"] = "in_playlist"
-            
-            with YoutubeDL(ydl_opts_full) as ydl_full:
-                full_info = ydl_full.extract_info(url, download=False)
-                entries = full_info.get("entries", [])
-                video_count = len([e for e in entries if e]) if entries else 0
-            
-            result = {
-                "success": True,
-                "id": info_dict.get("id"),
-                "title": info_dict.get("title", "Unknown Playlist"),
-                "channel": info_dict.get("channel") or info_dict.get("uploader", "Unknown"),
-                "video_count": video_count,
-                "thumbnail": info_dict.get("thumbnails", [{}])[0].get("url") if info_dict.get("thumbnails") else None,
-            }
-            
-            logger.info(f"Playlist: {result['title']} ({video_count} videos)")
-            return jsonify(result)
-            
+        info_dict = extract_info_pooled(ydl_opts, url)
+        
+        # Check if this is actually a playlist
+        if info_dict.get("_type") != "playlist":
+            return jsonify({"success": False, "error": "Not a playlist URL"}), 400
+        
+        entries = info_dict.get("entries") or []
+        video_count = sum(1 for e in entries if e)
+        
+        result = {
+            "success": True,
+            "id": info_dict.get("id"),
+            "title": info_dict.get("title", "Unknown Playlist"),
+            "channel": info_dict.get("channel") or info_dict.get("uploader", "Unknown"),
+            "video_count": video_count,
+            "thumbnail": info_dict.get("thumbnails", [{}])[0].get("url") if info_dict.get("thumbnails") else None,
+        }
+        
+        logger.info(f"Playlist: {result['title']} ({video_count} videos)")
+        return jsonify(result)
+        
     except Exception as e:
         logger.error(f"Error fetching playlist info: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+# Optional ISA-L acceleration (pip install isal): SIMD DEFLATE and PCLMUL CRC32,
+# with zlib-ng (pip install zlib-ng) as the fallback - same zlib-compatible API.
+# zipfile looks both up as module globals, so swapping them in is enough. CRC32 runs
+# over every byte, so this also speeds up the ZIP_STORED video entries.
+try:
+    from isal import isal_zlib as fast_zlib
+    FAST_ZLIB_NAME = "ISA-L"
+except ImportError:
+    try:
+        from zlib_ng import zlib_ng as fast_zlib
+        FAST_ZLIB_NAME = "zlib-ng"
+    except ImportError:
+        fast_zlib = None
+
+if fast_zlib is not None:
+    zipfile.zlib = fast_zlib
+    zipfile.crc32 = fast_zlib.crc32
+    logger.info(f"Using {FAST_ZLIB_NAME} for ZIP compression and CRC32")
+
+
+# Already-compressed media - DEFLATE burns CPU for ~0% size reduction, so store as-is
+STORED_MEDIA_EXTS = frozenset({".mp4", ".webm", ".mkv", ".m4a", ".mp3", ".opus"})
+
+
+# Fastest DEFLATE level for the few non-media entries (e.g. subtitles)
+ZIP_DEFLATE_LEVEL = 1
+
+
+def zip_compress_type(filepath):
+    """ZIP_STORED for media files, ZIP_DEFLATED for anything else, e.g. subtitles"""
+    ext = os.path.splitext(filepath)[1].lower()
+    return zipfile.ZIP_STORED if ext in STORED_MEDIA_EXTS else zipfile.ZIP_DEFLATED
+
+
+def download_playlist_entry(ydl_opts, temp_dir, index, video_url):
+    """Download one playlist video into temp_dir, prefixed with its playlist position"""
+    opts = {**ydl_opts, "outtmpl": os.path.join(temp_dir, f"{index:02d} - %(title)s.%(ext)s")}
+    try:
+        with ReadOnlyCookiesYDL(opts) as ydl:
+            ydl.extract_info(video_url, download=True)
+    except Exception as e:
+        logger.warning(f"Playlist video {index} failed: {e}")
+
+
+# Videos one playlist request may have queued on DOWNLOAD_EXECUTOR at a time - the
+# whole pool, so a lone playlist still downloads PLAYLIST_DOWNLOAD_WORKERS videos at
+# once. Submitting the rest only as each finishes keeps the FIFO pool fair: a second
+# playlist's jobs queue behind a few videos, not behind the first one's whole list
+PLAYLIST_MAX_IN_FLIGHT = PLAYLIST_DOWNLOAD_WORKERS
+
+
+class PlaylistDownloadJobs:
+    """Feeds one playlist's videos to DOWNLOAD_EXECUTOR a few at a time.
+    
+    Finished files arrive on `completed` (via yt-dlp's post_hooks), followed by
+    a None sentinel once every job has finished; `done` is set at the same time.
+    """
+    def __init__(self, ydl_opts, temp_dir, entries):
+        self.completed = queue.Queue()
+        self.done = Event()
+        self.ydl_opts = {**ydl_opts, "post_hooks": [self.completed.put]}
+        self.temp_dir = temp_dir
+        self.pending = deque(entries)  # (playlist index, video URL)
+        self.futures = []
+        self.in_flight = 0
+        self.cancelled = False
+        self.lock = Lock()
+    
+    def _submit_next(self):
+        """Queue the next pending video (lock held); returns its future or None"""
+        if self.cancelled or not self.pending:
+            return None
+        index, video_url = self.pending.popleft()
+        future = DOWNLOAD_EXECUTOR.submit(download_playlist_entry, self.ydl_opts, self.temp_dir, index, video_url)
+        self.futures.append(future)
+        self.in_flight += 1
+        return future
+    
+    def _watch(self, future):
+        # Outside the lock - the callback runs immediately if the job already finished
+        if future is not None:
+            future.add_done_callback(self._job_finished)
+    
+    def start(self):
+        with self.lock:
+            started = [self._submit_next() for _ in range(PLAYLIST_MAX_IN_FLIGHT)]
+            finished = self.in_flight == 0
+        if finished:
+            self._finish()
+        for future in started:
+            self._watch(future)
+    
+    def _job_finished(self, future):
+        with self.lock:
+            self.in_flight -= 1
+            next_future = self._submit_next()
+            finished = self.in_flight == 0
+        if finished:
+            self._finish()
+        self._watch(next_future)
+    
+    def _finish(self):
+        self.completed.put(None)  # Sentinel - no more files
+        self.done.set()
+    
+    def cancel(self):
+        """Stop queueing videos and cancel the ones not yet started"""
+        with self.lock:
+            self.cancelled = True
+            self.pending.clear()
+            futures = list(self.futures)
+        for future in futures:
+            future.cancel()
+
+
+def finish_playlist_download(jobs, temp_dir):
+    """Remove the playlist temp dir once no download is still writing into it"""
+    def cleanup():
+        jobs.done.wait()
+        remove_temp_dir(temp_dir, "Playlist temp files cleaned up", background=False)
+    
+    # Wait for the downloads and delete off the request thread
+    Thread(target=cleanup, daemon=True).start()
+
+
+class _ZipStreamSink:
+    """Write-only file object that collects ZIP output until it is drained.
+    
+    It has no tell()/seek(), so zipfile treats it as unseekable and writes
+    data descriptors after each entry instead of seeking back to patch headers.
+    """
+    def __init__(self):
+        self._chunks = []
+    
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(filepaths):
+    """Yield a ZIP archive of `filepaths` while it is being built - no temp zip on disk.
+    
+    Each source file is deleted once it has been added.
+    """
+    sink = _ZipStreamSink()
+    # Read into one reusable buffer instead of allocating a new bytes object per read
+    buf = bytearray(STREAM_CHUNK_SIZE)
+    view = memoryview(buf)
+    with zipfile.ZipFile(sink, "w") as zipf:
+        for filepath in filepaths:
+            # from_file records size/mtime so zipfile can pick ZIP64 for large videos
+            zinfo = zipfile.ZipInfo.from_file(filepath, os.path.basename(filepath))
+            zinfo.compress_type = zip_compress_type(filepath)
+            # ZipFile.open() takes the level from the ZipInfo, not the ZipFile
+            zinfo._compresslevel = ZIP_DEFLATE_LEVEL
+            with open_for_streaming(filepath) as src, zipf.open(zinfo, "w") as dst:
+                while True:
+                    n = src.readinto(buf)
+                    if not n:
+                        break
+                    dst.write(view[:n])
+                    data = sink.drain()
+                    if data:
+                        yield data
+            # The bytes are in the archive now - free the temp space early so
+            # peak usage stays near one copy of the playlist
+            try:
+                os.remove(filepath)
+            except OSError:
+                pass
+            yield sink.drain()  # Data descriptor for this entry
+    yield sink.drain()  # Central directory
+
+
 @app.route("/download-playlist", methods=["GET"])
 @limiter.limit("5 per hour")
 def download_playlist():
@@ -765,17 +1755,18 @@ def download_playlist():
     logger.info(f"Starting playlist download: {url} (format: {format_str})")
     
     temp_dir = None
+    jobs = None
     
     try:
         # Create temp directory for downloads
-        temp_dir = tempfile.mkdtemp()
-        output_template = os.path.join(temp_dir, "%(playlist_index)02d - %(title)s.%(ext)s")
+        temp_dir = tempfile.mkdtemp(dir=download_temp_root())
         
-        # Get download options
-        ydl_opts = get_ydl_opts(for_download=True, format_str=format_str)
-        ydl_opts["outtmpl"] = output_template
-        ydl_opts["noplaylist"] = False  # Enable playlist download
+        # Get download options (per video - outtmpl is set for each entry)
+        ydl_opts = get_ydl_opts(for_download=True, format_str=format_str, chunk_size=request_chunk_size())
+        ydl_opts["noplaylist"] = True  # Each job downloads a single video
         ydl_opts["ignoreerrors"] = True  # Continue on individual video errors
+        # Fetch each video's DASH/HLS fragments in parallel (threads inside yt-dlp)
+        ydl_opts["concurrent_fragment_downloads"] = PLAYLIST_FRAGMENT_CONCURRENCY
         
         # Add subtitle options if requested
         if subtitles:
@@ -800,84 +1791,87 @@ def download_playlist():
         
         logger.info(f"Downloading playlist to: {temp_dir}")
         
-        # Download the playlist
-        with YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
-            playlist_name = info.get("title", playlist_title)
+        # Enumerate the playlist with a flat extraction...
+        listing_opts = get_ydl_opts(for_download=False)
+        listing_opts["extract_flat"] = "in_playlist"
+        playlist = extract_info_pooled(listing_opts, url)
+        playlist_name = playlist.get("title", playlist_title)
+        # Number before filtering, so unavailable (None) entries keep their slot
+        # and the "NN - " prefixes match playlist positions
+        entries = [
+            (index, entry.get("url") or entry.get("webpage_url"))
+            for index, entry in enumerate(playlist.get("entries") or [], 1) if entry
+        ]
+        entries = [(index, entry_url) for index, entry_url in entries if entry_url]
+        
+        # ...then download the videos concurrently. yt-dlp calls post_hooks with the
+        # final path once a video is fully post-processed, so finished files can be
+        # zipped and sent while the rest are still downloading
+        jobs = PlaylistDownloadJobs(ydl_opts, temp_dir, entries)
+        jobs.start()
         
-        # Find all downloaded files
-        downloaded_files = []
-        for f in sorted(os.listdir(temp_dir)):
-            filepath = os.path.join(temp_dir, f)
-            if os.path.isfile(filepath) and not f.endswith(('.vtt', '.srt', '.ass')):
-                downloaded_files.append(filepath)
+        def next_video_file():
+            while True:
+                filepath = jobs.completed.get()
+                if filepath is None or (os.path.isfile(filepath) and not filepath.endswith(('.vtt', '.srt', '.ass'))):
+                    return filepath
         
-        if not downloaded_files:
+        # Wait for the first video so a playlist where everything fails still gets an error
+        first_file = next_video_file()
+        if first_file is None:
             logger.error("Playlist download failed - no files found")
-            if temp_dir:
-                shutil.rmtree(temp_dir, ignore_errors=True)
+            remove_temp_dir(temp_dir, "Playlist temp files cleaned up")
             return jsonify({"error": "Playlist download failed - no files created"}), 500
         
-        logger.info(f"Downloaded {len(downloaded_files)} videos from playlist")
-        
-        # Create ZIP file in memory
-        zip_path = os.path.join(temp_dir, "playlist.zip")
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for filepath in downloaded_files:
-                arcname = os.path.basename(filepath)
-                zipf.write(filepath, arcname)
-        
-        zip_size = os.path.getsize(zip_path)
+        def downloaded_files():
+            filepath = first_file
+            while filepath is not None:
+                yield filepath
+                filepath = next_video_file()
         
         # Build filename
-        safe_title = "".join(c for c in playlist_name if c.isalnum() or c in " -_").strip()
-        if not safe_title:
-            safe_title = "playlist"
+        safe_title = safe_filename_part(playlist_name) or "playlist"
         
         if resolution:
             filename = f"{safe_title} ({resolution}).zip"
         else:
             filename = f"{safe_title}.zip"
         
-        from urllib.parse import quote
-        filename_encoded = quote(filename)
-        ascii_filename = "".join(c if ord(c) < 128 else '_' for c in filename)
-        
-        logger.info(f"Playlist ZIP ready: {filename} ({zip_size} bytes, {len(downloaded_files)} videos)")
-        
-        def generate():
-            try:
-                with open(zip_path, "rb") as f:
-                    while True:
-                        chunk = f.read(65536)
-                        if not chunk:
-                            break
-                        yield chunk
-            finally:
-                try:
-                    shutil.rmtree(temp_dir, ignore_errors=True)
-                    logger.info("Playlist temp files cleaned up")
-                except Exception as e:
-                    logger.error(f"Cleanup error: {e}")
+        logger.info(f"Streaming playlist ZIP: {filename} ({len(entries)} videos queued)")
         
+        # No Content-Length: the archive is built while it is sent (chunked transfer)
         headers = {
-            "Content-Disposition": f"attachment; filename=\"{ascii_filename}\"; filename*=UTF-8''{filename_encoded}",
-            "Content-Length": str(zip_size),
+            "Content-Disposition": content_disposition(filename),
             "Content-Type": "application/zip",
-            "Accept-Ranges": "bytes",
             "Cache-Control": "no-cache",
         }
         
-        return Response(
-            stream_with_context(generate()),
+        response = Response(
+            stream_with_context(stream_zip(downloaded_files())),
             mimetype="application/zip",
             headers=headers
         )
         
+        # The response owns the temp dir from here on. call_on_close also runs when
+        # the body was never iterated, unlike a generator's finally block
+        playlist_dir = temp_dir
+        temp_dir = None
+        
+        @response.call_on_close
+        def cleanup():
+            # Client may have disconnected early - stop queued downloads
+            jobs.cancel()
+            finish_playlist_download(jobs, playlist_dir)
+        
+        return response
+        
     except Exception as e:
         logger.error(f"Playlist download error: {e}")
-        if temp_dir:
-            shutil.rmtree(temp_dir, ignore_errors=True)
+        if temp_dir and jobs is not None:
+            jobs.cancel()
+            finish_playlist_download(jobs, temp_dir)
+        elif temp_dir:
+            remove_temp_dir(temp_dir, "Playlist temp files cleaned up")
         return jsonify({"success": False, "error": str(e)}), 500
 
 
@@ -892,8 +1886,16 @@ if __name__ == "__main__":
     print("Endpoints:")
     print("  GET /health - Check server status")
     print("  GET /info?url=<youtube_url> - Get video info")
+    print("  POST /invalidate?url=<youtube_url> - Drop cached video info")
     print("  GET /download?url=<youtube_url>&format=<format> - Download video")
+    print("      (add &stream=1 to pipe bytes while yt-dlp is still downloading)")
+    print("      (add &chunk_mb=<1-64> to tune yt-dlp's HTTP chunk size)")
     print("  GET /playlist-info?url=<playlist_url> - Get playlist info")
     print("  GET /download-playlist?url=<playlist_url>&format=<format> - Download playlist")
+    print("="*60)
+    print("Development server - for regular use run:")
+    print("  gunicorn -c backend/gunicorn.conf.py")
     print("="*60 + "\n")
-    app.run(debug=True, port=5000, threaded=True)
\ No newline at end of file
+    # Debug mode (reloader + debugger) only when explicitly requested
+    debug = os.environ.get("FLASK_DEBUG", "").lower() in ("1", "true", "yes")
+    app.run(debug=debug, port=5000, threaded=True)
\ No newline at end of file